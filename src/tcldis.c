@@ -368,6 +368,152 @@ err:
 	return NULL;
 }
 
+/*
+ * Tcl operands are big-endian and either 1 or 4 bytes wide. Decode them with
+ * unsigned arithmetic throughout so sign extension never relies on shifting a
+ * negative value.
+ */
+static inline unsigned long
+decodeU1(const unsigned char *p)
+{
+	return p[0];
+}
+
+static inline long
+decodeS1(const unsigned char *p)
+{
+	return (long)p[0] - ((p[0] & 0x80) ? 0x100L : 0);
+}
+
+static inline unsigned long
+decodeU4(const unsigned char *p)
+{
+	return ((unsigned long)p[0] << 24) | ((unsigned long)p[1] << 16) |
+		((unsigned long)p[2] << 8) | (unsigned long)p[3];
+}
+
+static inline long
+decodeS4(const unsigned char *p)
+{
+	unsigned long u = decodeU4(p);
+	if (u & 0x80000000UL)
+		return -(long)(0xffffffffUL - u) - 1;
+	return (long)u;
+}
+
+static PyObject *
+tcldis_decode_insts(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	static char *kwlist[] = {"bytecode", "start", NULL};
+	Py_buffer bcBuf;
+	Py_ssize_t loc = 0;
+
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "s*|n", kwlist,
+			&bcBuf, &loc))
+		return NULL;
+
+	const InstructionDesc *insts =
+		(const InstructionDesc *)TclGetInstructionTable();
+	int numInsts = 0;
+	while (insts[numInsts].name != NULL)
+		numInsts++;
+
+	const unsigned char *codeStart = bcBuf.buf;
+	Py_ssize_t numCodeBytes = bcBuf.len;
+	if (loc < 0 || loc > numCodeBytes) {
+		PyErr_Format(PyExc_ValueError,
+			"start %zd outside bytecode of length %zd", loc, numCodeBytes);
+		PyBuffer_Release(&bcBuf);
+		return NULL;
+	}
+
+	/*
+	 * Walk the bytecode in a single pass, decoding each instruction into a
+	 * (loc, opcode, operands) tuple. Operands are left as raw integers,
+	 * resolving local and aux indexes is left to the caller.
+	 */
+	PyObject *pInsts = PyList_New(0);
+	PyObject *pInst = NULL;
+	PyObject *pInstOperands = NULL, *pInstOperand = NULL;
+	if (pInsts == NULL)
+		goto err;
+
+	const unsigned char *pc;
+	const InstructionDesc *inst;
+	int opIdx, opOffset;
+	while (loc < numCodeBytes) {
+		pc = codeStart + loc;
+		if (*pc >= numInsts) {
+			RUNERR("unknown opcode %d at %zd", *pc, loc);
+			goto err;
+		}
+		inst = &insts[*pc];
+		if (loc + inst->numBytes > numCodeBytes) {
+			RUNERR("truncated instruction at %zd", loc);
+			goto err;
+		}
+
+		pInstOperands = PyTuple_New(inst->numOperands);
+		if (pInstOperands == NULL)
+			goto err;
+		opOffset = 1;
+		for (opIdx = 0; opIdx < inst->numOperands; opIdx++) {
+			/* Unsigned operands are converted unsigned, they may not fit a long */
+			switch (inst->opTypes[opIdx]) {
+			case OPERAND_INT1:
+				pInstOperand = PyInt_FromLong(decodeS1(pc+opOffset));
+				opOffset++;
+				break;
+			case OPERAND_UINT1:
+			case OPERAND_LVT1:
+				pInstOperand = PyInt_FromSize_t(decodeU1(pc+opOffset));
+				opOffset++;
+				break;
+			case OPERAND_INT4:
+			case OPERAND_IDX4:
+				pInstOperand = PyInt_FromLong(decodeS4(pc+opOffset));
+				opOffset += 4;
+				break;
+			case OPERAND_UINT4:
+			case OPERAND_LVT4:
+			case OPERAND_AUX4:
+				pInstOperand = PyInt_FromSize_t(decodeU4(pc+opOffset));
+				opOffset += 4;
+				break;
+			default:
+				RUNERR("unknown operand type %d at %zd",
+					inst->opTypes[opIdx], loc);
+				goto err;
+			}
+			if (pInstOperand == NULL)
+				goto err;
+			/* Steals the reference */
+			PyTuple_SET_ITEM(pInstOperands, opIdx, pInstOperand);
+			pInstOperand = NULL;
+		}
+
+		pInst = Py_BuildValue("(niO)", loc, (int)*pc, pInstOperands);
+		if (pInst == NULL)
+			goto err;
+		Py_CLEAR(pInstOperands);
+		if (PyList_Append(pInsts, pInst) != 0)
+			goto err;
+		Py_CLEAR(pInst);
+
+		loc += inst->numBytes;
+	}
+
+	PyBuffer_Release(&bcBuf);
+	return pInsts;
+
+err:
+	PyBuffer_Release(&bcBuf);
+	Py_XDECREF(pInsts);
+	Py_XDECREF(pInst);
+	Py_XDECREF(pInstOperands); Py_XDECREF(pInstOperand);
+	return NULL;
+}
+
 static PyObject *
 tcldis_literal_convert(PyObject *self, PyObject *args, PyObject *kwargs)
 {
@@ -431,6 +577,9 @@ static PyMethodDef TclDisMethods[] = {
 	{"inst_table",  (PyCFunction)tcldis_inst_table,
 		METH_VARARGS | METH_KEYWORDS,
 		"Get the instruction table for Tcl bytecode."},
+	{"decode_insts",  (PyCFunction)tcldis_decode_insts,
+		METH_VARARGS | METH_KEYWORDS,
+		"Decode Tcl bytecode into a list of (loc, opcode, operands) tuples."},
 	{"literal_convert",  (PyCFunction)tcldis_literal_convert,
 		METH_VARARGS | METH_KEYWORDS,
 		"Set the converter for a type of literal value."},
@@ -1,8 +1,6 @@
 from __future__ import print_function
 
-import struct
-import itertools
-from collections import namedtuple, OrderedDict
+from collections import namedtuple, OrderedDict, Counter
 
 import _tcldis
 printbc = _tcldis.printbc
@@ -24,9 +22,10 @@ getbc.__doc__ = _tcldis.getbc.__doc__
 literal_convert = _tcldis.literal_convert
 
 INSTRUCTIONS = _tcldis.inst_table()
-JUMP_INSTRUCTIONS = [
+JUMP_INSTRUCTIONS = frozenset([
     'jump1', 'jump4', 'jumpTrue1', 'jumpTrue4', 'jumpFalse1', 'jumpFalse4'
-]
+])
+CATCH_INSTRUCTIONS = frozenset(['beginCatch4', 'endCatch'])
 
 TAG_BLOCK_JOIN = 'block_join'
 TAG_BLOCK_RM   = 'block_rm'
@@ -37,30 +36,36 @@ TAG_I_PUSH     = 'i_push'
 TAG_I_OTHER    = 'i_other'
 TAG_H_VARIABLE = 'h_variable'
 
-def _getop(optype):
-    """
-    Given a C struct descriptor, return a function which will take the necessary
-    bytes off the front of a bytearray and return the python value.
-    """
-    def getop_lambda(bc):
-        # The 'standard' sizes in the struct module match up to what Tcl expects
-        numbytes = struct.calcsize(optype)
-        opbytes = ''.join([chr(bc.pop(0)) for _ in range(numbytes)])
-        return struct.unpack(optype, opbytes)[0]
-    return getop_lambda
-
 # InstOperandType from tclCompile.h
 OPERANDS = [
-    ('NONE',  None), # Should never be present
-    ('INT1',  _getop('>b')),
-    ('INT4',  _getop('>i')),
-    ('UINT1', _getop('>B')),
-    ('UINT4', _getop('>I')),
-    ('IDX4',  _getop('>i')),
-    ('LVT1',  _getop('>B')),
-    ('LVT4',  _getop('>I')),
-    ('AUX4',  _getop('>I')),
+    'NONE', # Should never be present
+    'INT1',
+    'INT4',
+    'UINT1',
+    'UINT4',
+    'IDX4',
+    'LVT1',
+    'LVT4',
+    'AUX4',
 ]
+INT_OPERANDS = frozenset(['INT1', 'INT4', 'UINT1', 'UINT4'])
+LVT_OPERANDS = frozenset(['LVT1', 'LVT4'])
+
+# INSTRUCTIONS flattened into a tuple indexed by opcode, so interpreting an
+# instruction needs a single lookup. Each entry is (name, num_bytes, operands)
+# where operands is a tuple of OPERANDS names. Operand types newer than
+# OPERANDS become 'UNKNOWN' - decode_insts refuses to decode those instructions.
+INST_DISPATCH = tuple([
+    (inst['name'], inst['num_bytes'], tuple([
+        OPERANDS[o] if o < len(OPERANDS) else 'UNKNOWN' for o in inst['operands']
+    ]))
+    for inst in INSTRUCTIONS
+])
+INST_OPCODES = dict([
+    (name, opcode) for opcode, (name, _, _) in enumerate(INST_DISPATCH)
+])
+PUSH1 = INST_OPCODES['push1']
+PUSH4 = INST_OPCODES['push4']
 
 class BC(object):
     def __init__(self, bytecode, bcliterals, bclocals, bcauxs):
@@ -97,6 +102,8 @@ class BC(object):
         return self._locals[n]
     def aux(self, n):
         return self._auxs[n]
+    def bytecode(self):
+        return self._bytecode
     def peek1(self):
         return self._bytecode[self._pc]
     def pc(self):
@@ -111,32 +118,29 @@ class BC(object):
         return bc
 
 # Tcl bytecode instruction
-InstTuple = namedtuple('InstTuple', ['loc', 'name', 'ops', 'targetloc'])
+InstTuple = namedtuple('InstTuple', ['loc', 'name', 'ops', 'targetloc', 'opcode'])
 class Inst(InstTuple):
-    def __new__(cls, bc):
+    __slots__ = ()
+    def __new__(cls, bc, loc, opcode, rawops):
         d = {}
-        d['loc'] = bc.pc()
-        bytecode = bc.get(INSTRUCTIONS[bc.peek1()]['num_bytes'])
-        inst_type = INSTRUCTIONS[bytecode.pop(0)]
-        d['name'] = inst_type['name']
+        d['loc'] = loc
+        d['opcode'] = opcode
+        d['name'], _, operands = INST_DISPATCH[opcode]
         ops = []
-        for opnum in inst_type['operands']:
-            optype, getop = OPERANDS[opnum]
-            if optype in ['INT1', 'INT4', 'UINT1', 'UINT4']:
-                ops.append(getop(bytecode))
-            elif optype in ['LVT1', 'LVT4']:
-                ops.append(bc.local(getop(bytecode)))
-            elif optype in ['AUX4']:
-                ops.append(bc.aux(getop(bytecode)))
-                auxtype, auxdata = ops[-1]
-                if auxtype == 'ForeachInfo':
-                    auxdata = [
-                        [bc.local(varidx) for varidx in varlist]
-                        for varlist in auxdata
-                    ]
-                else:
-                    assert False
-                ops[-1] = (auxtype, auxdata)
+        for optype, op in zip(operands, rawops):
+            if optype in INT_OPERANDS:
+                ops.append(op)
+            elif optype in LVT_OPERANDS:
+                ops.append(bc.local(op))
+            elif optype == 'AUX4':
+                # ForeachInfo is the only aux type handled so the type name is
+                # implied and the operand is just the list of variable lists
+                auxtype, auxdata = bc.aux(op)
+                assert auxtype == 'ForeachInfo'
+                ops.append([
+                    [bc.local(varidx) for varidx in varlist]
+                    for varlist in auxdata
+                ])
             else:
                 assert False
         d['ops'] = tuple(ops)
@@ -149,9 +153,6 @@ class Inst(InstTuple):
 
         return super(Inst, cls).__new__(cls, **d)
 
-    def __init__(self, bc, *args, **kwargs):
-        super(Inst, self).__init__(*args, **kwargs)
-
     def __str__(self):
         return '<%s: %s %s>' % (
             self.loc if self.loc is not None else '?',
@@ -167,6 +168,7 @@ class Inst(InstTuple):
 
 BCValueTuple = namedtuple('BCValueTuple', ['inst', 'value', 'stackn'])
 class BCValue(BCValueTuple):
+    __slots__ = ()
     def __new__(cls, inst, value):
         d = {}
         d['inst'] = inst
@@ -180,15 +182,23 @@ class BCValue(BCValueTuple):
         d['value'] = value
         d['stackn'] = 1
         return super(BCValue, cls).__new__(cls, **d)
-    def __init__(self, inst, value, *args, **kwargs):
-        super(BCValue, self).__init__(*args, **kwargs)
+    def __init__(self, inst, value):
+        # All fields are set by __new__, subclasses extend this with checks
+        pass
     def destack(self):
         assert self.stackn == 1
         return self._replace(stackn=self.stackn-1)
     def __repr__(self): assert False
-    def fmt(self): assert False
+    # Nested values append their fragments to a shared list via emit, so
+    # formatting does a single join at the top rather than one per level
+    def fmt(self):
+        out = []
+        self.emit(out)
+        return u''.join(out)
+    def emit(self, out): assert False
 
 class BCLiteral(BCValue):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCLiteral, self).__init__(*args, **kwargs)
         assert type(self.value) is unicode
@@ -233,62 +243,83 @@ class BCLiteral(BCValue):
         else:
             val = u'{%s}' % (val,)
         return val
+    def emit(self, out):
+        out.append(self.fmt())
 
 class BCVarRef(BCValue):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCVarRef, self).__init__(*args, **kwargs)
         assert len(self.value) == 1
     def __repr__(self):
         return 'BCVarRef(%s)' % (repr(self.value),)
-    def fmt(self):
-        return u'$' + self.value[0].fmt()
+    def emit(self, out):
+        out.append(u'$')
+        self.value[0].emit(out)
 
 class BCArrayRef(BCValue):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCArrayRef, self).__init__(*args, **kwargs)
         assert len(self.value) == 2
     def __repr__(self):
         return 'BCArrayRef(%s)' % (repr(self.value),)
-    def fmt(self):
-        return u'$%s(%s)' % (self.value[0].fmt(), self.value[1].fmt())
+    def emit(self, out):
+        out.append(u'$')
+        self.value[0].emit(out)
+        out.append(u'(')
+        self.value[1].emit(out)
+        out.append(u')')
 
 class BCConcat(BCValue):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCConcat, self).__init__(*args, **kwargs)
         assert len(self.value) > 1
     def __repr__(self):
         return 'BCConcat(%s)' % (repr(self.value),)
-    def fmt(self):
+    def emit(self, out):
         # TODO: this won't always work, need to be careful of
         # literals following variables
-        return u'"%s"' % (u''.join([v.fmt() for v in self.value]),)
+        out.append(u'"')
+        for v in self.value:
+            v.emit(out)
+        out.append(u'"')
 
 class BCProcCall(BCValue):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCProcCall, self).__init__(*args, **kwargs)
         assert len(self.value) >= 1
     def __repr__(self):
         return 'BCProcCall(%s)' % (self.value,)
-    def fmt(self):
-        args = list(self.value)
-        if args[0].fmt() == u'::tcl::array::set':
-            args[0:1] = [BCLiteral(None, 'array'), BCLiteral(None, 'set')]
-        cmd = u' '.join([arg.fmt() for arg in args])
-        if self.stackn:
-            cmd = u'[%s]' % (cmd,)
-        return cmd
+    def emit(self, out):
+        if self.stackn: out.append(u'[')
+        self.emit_cmd(out)
+        if self.stackn: out.append(u']')
+    # The command itself, without [] for command substitution
+    def emit_cmd(self, out):
+        args = self.value
+        if isinstance(args[0], BCLiteral) and args[0].value == u'::tcl::array::set':
+            out.append(u'array set')
+        else:
+            args[0].emit(out)
+        for arg in args[1:]:
+            out.append(u' ')
+            arg.emit(out)
 
 class BCSet(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCSet, self).__init__(*args, **kwargs)
         assert len(self.value) == 2
     def __repr__(self):
         return 'BCSet(%s)' % (self.value,)
-    def fmt(self):
-        cmd = u'set %s %s' % tuple([v.fmt() for v in self.value])
-        if self.stackn:
-            cmd = u'[%s]' % (cmd,)
-        return cmd
+    def emit_cmd(self, out):
+        out.append(u'set ')
+        self.value[0].emit(out)
+        out.append(u' ')
+        self.value[1].emit(out)
 
 # This one is odd. inst.ops[0] is the index to the locals table, kv[0]
 # is namespace::value, or value if looking at the same namespace (i.e.
@@ -297,6 +328,7 @@ class BCSet(BCProcCall):
 # Additionally, note there is a hack we apply before reducing to recognise
 # that Tcl gives variable calls a return value.
 class BCVariable(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCVariable, self).__init__(*args, **kwargs)
         assert len(self.value) == 1
@@ -304,13 +336,12 @@ class BCVariable(BCProcCall):
         assert self.value[0].fmt().endswith(self.inst.ops[0])
     def __repr__(self):
         return 'BCVariable(%s)' % (self.value,)
-    def fmt(self):
-        cmd = u'variable %s' % (self.value[0].fmt(),)
-        if self.stackn:
-            cmd = u'[%s]' % (cmd,)
-        return cmd
+    def emit_cmd(self, out):
+        out.append(u'variable ')
+        self.value[0].emit(out)
 
 class BCExpr(BCValue):
+    __slots__ = ()
     _exprmap = {
         'gt': (u'>', 2),
         'lt': (u'<', 2),
@@ -328,16 +359,25 @@ class BCExpr(BCValue):
     def __repr__(self):
         return 'BCExpr(%s)' % (self.value,)
     def expr(self):
+        out = []
+        self.emit_expr(out)
+        return u''.join(out)
+    def emit_expr(self, out):
         op, nargs = self._exprmap[self.inst.name]
         if nargs == 1:
-            expr = u'%s %s' % (op, self.value[0].fmt())
+            out.append(op + u' ')
+            self.value[0].emit(out)
         elif nargs == 2:
-            expr = u'%s %s %s' % (self.value[0].fmt(), op, self.value[1].fmt())
-        return expr
-    def fmt(self):
-        return u'[expr {%s}]' % (self.expr(),)
+            self.value[0].emit(out)
+            out.append(u' %s ' % (op,))
+            self.value[1].emit(out)
+    def emit(self, out):
+        out.append(u'[expr {')
+        self.emit_expr(out)
+        out.append(u'}]')
 
 class BCReturn(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCReturn, self).__init__(*args, **kwargs)
         assert len(self.value) == 2
@@ -346,9 +386,12 @@ class BCReturn(BCProcCall):
         assert self.inst.ops[1] == 1 # Level
     def __repr__(self):
         return 'BCReturn(%s)' % (repr(self.value),)
-    def fmt(self):
-        if self.value[0].value == '': return u'return'
-        return u'return %s' % (self.value[0].fmt(),)
+    def emit(self, out):
+        if self.value[0].value == '':
+            out.append(u'return')
+            return
+        out.append(u'return ')
+        self.value[0].emit(out)
 
 # TODO: I'm totally unsure about where this goes. tclCompile.c says it has a -1
 # stack effect, which means it doesn't put anything back on the stack. But
@@ -356,6 +399,7 @@ class BCReturn(BCProcCall):
 # the stack (after consuming two items). The overall stack effect is the same,
 # but the end value is different...
 class BCDone(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCDone, self).__init__(*args, **kwargs)
         # Unfortunately cannot be sure this is a BCProcCall as done is sometimes
@@ -364,14 +408,17 @@ class BCDone(BCProcCall):
         assert len(self.value) == 1
     def __repr__(self):
         return 'BCDone(%s)' % (repr(self.value),)
-    def fmt(self):
+    def emit(self, out):
         # In the general case it's impossible to guess whether 'return' was written.
         if isinstance(self.value[0], BCProcCall):
-            return self.value[0].destack().fmt()
-        return u'return %s' % (self.value[0].fmt(),)
+            self.value[0].destack().emit(out)
+            return
+        out.append(u'return ')
+        self.value[0].emit(out)
 
 # self.value contains two bblocks, self.inst contains two jumps
 class BCIf(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCIf, self).__init__(*args, **kwargs)
         assert len(self.value) == len(self.inst) == 2
@@ -379,7 +426,7 @@ class BCIf(BCProcCall):
         assert self.inst[0].on in (True, False) and self.inst[1].on is None
     def __repr__(self):
         return 'BCIf(%s)' % (self.value,)
-    def fmt(self):
+    def emit_cmd(self, out):
         value = list(self.value)
         # An if condition takes 'ownership' of the values returned in any
         # of its branches
@@ -401,18 +448,16 @@ class BCIf(BCProcCall):
             conditionstr = self.inst[0].value[0].fmt()
             if self.inst[0].on is True:
                 conditionstr = '!%s' % (conditionstr,)
-        cmd = (
+        out.append(
             u'if {%s} {\n\t%s\n}' % (conditionstr, value[0].fmt().replace('\n', '\n\t'))
         )
         if len(value[1].insts) > 0:
-            cmd += (
+            out.append(
                 u' else {\n\t%s\n}' % (value[1].fmt().replace('\n', '\n\t'),)
             )
-        if self.stackn:
-            cmd = u'[%s]' % (cmd,)
-        return cmd
 
 class BCCatch(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCCatch, self).__init__(*args, **kwargs)
         assert len(self.value) == 3
@@ -437,19 +482,17 @@ class BCCatch(BCProcCall):
         ]))
     def __repr__(self):
         return 'BCCatch(%s)' % (self.value,)
-    def fmt(self):
+    def emit_cmd(self, out):
         begin, _, end = self.value
         # Nail down the details and move things around to our liking
         begin = begin.replaceinst((-3, -2), [begin.insts[-3].destack()])
         begin = begin.popinst().popinst().replaceinst(0, [])
         catchblock = begin.fmt()
         varname = end.insts[2].ops[0]
-        cmd = u'catch {%s} %s' % (catchblock, varname)
-        if self.stackn:
-            cmd = u'[%s]' % (cmd,)
-        return cmd
+        out.append(u'catch {%s} %s' % (catchblock, varname))
 
 class BCForeach(BCProcCall):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCForeach, self).__init__(*args, **kwargs)
         assert len(self.value) == 4
@@ -474,34 +517,36 @@ class BCForeach(BCProcCall):
         ]))
         # Nail down the details and move things around to our liking
         assert begin.insts[1].ops[0] == step.insts[0].ops[0]
-        assert len(begin.insts[1].ops[0][1]) == 1
+        assert len(begin.insts[1].ops[0]) == 1
     def __repr__(self):
         return 'BCForeach(%s)' % (self.value,)
-    def fmt(self):
+    def emit_cmd(self, out):
         value = list(self.value)
         value[2] = value[2].popinst()
         # TODO: this is lazy
-        fevars = ' '.join(value[0].insts[1].ops[0][1][0])
+        fevars = ' '.join(value[0].insts[1].ops[0][0])
         felist = value[0].insts[0].value[1].fmt()
         feblock = '\n\t' + value[2].fmt().replace('\n', '\n\t') + '\n'
-        cmd = u'foreach {%s} %s {%s}' % (fevars, felist, feblock)
-        if self.stackn:
-            cmd = u'[%s]' % (cmd,)
-        return cmd
+        out.append(u'foreach {%s} %s {%s}' % (fevars, felist, feblock))
 
 ####################################################################
 # My own representation of anything that cannot be used as a value #
 ####################################################################
 
 class BCNonValue(object):
-    def __init__(self, inst, value, *args, **kwargs):
-        super(BCNonValue, self).__init__(*args, **kwargs)
+    __slots__ = ('inst', 'value')
+    def __init__(self, inst, value):
         self.inst = inst
         self.value = value
     def __repr__(self): assert False
-    def fmt(self): assert False
+    def fmt(self):
+        out = []
+        self.emit(out)
+        return u''.join(out)
+    def emit(self, out): assert False
 
 class BCJump(BCNonValue):
+    __slots__ = ('on', 'targetloc')
     def __init__(self, on, *args, **kwargs):
         super(BCJump, self).__init__(*args, **kwargs)
         assert len(self.value) == 0 if on is None else 1
@@ -512,19 +557,23 @@ class BCJump(BCNonValue):
         if self.on is not None:
             condition = '(%s==%s)' % (self.on, self.value)
         return 'BCJump%s->%s' % (condition, self.inst.targetloc)
-    def fmt(self):
-        #return 'JUMP%s(%s)' % (self.on, self.value[0].fmt())
-        return unicode(self)
+    def emit(self, out):
+        #out.append('JUMP%s(%s)' % (self.on, self.value[0].fmt()))
+        out.append(unicode(self))
 
 # Just a formatting container for the form a(x)
 class BCArrayElt(BCNonValue):
+    __slots__ = ()
     def __init__(self, *args, **kwargs):
         super(BCArrayElt, self).__init__(*args, **kwargs)
         assert len(self.value) == 2
     def __repr__(self):
         return 'BCArrayElt(%s)' % (repr(self.value),)
-    def fmt(self):
-        return u'%s(%s)' % (self.value[0].fmt(), self.value[1].fmt())
+    def emit(self, out):
+        self.value[0].emit(out)
+        out.append(u'(')
+        self.value[1].emit(out)
+        out.append(u')')
 
 ##############################
 # Any basic block structures #
@@ -532,8 +581,8 @@ class BCArrayElt(BCNonValue):
 
 # Basic block, containing a linear flow of logic
 class BBlock(object):
-    def __init__(self, insts, loc, *args, **kwargs):
-        super(BBlock, self).__init__(*args, **kwargs)
+    __slots__ = ('insts', 'loc')
+    def __init__(self, insts, loc):
         assert type(insts) is list
         assert type(loc) is int
         self.insts = tuple(insts)
@@ -579,65 +628,62 @@ class BBlock(object):
 
 def getinsts(bc):
     """
-    Given bytecode in a bytearray, return a list of Inst objects.
+    Given bytecode in a BC object, return a list of Inst objects from the
+    current pc onwards. The raw instructions are decoded by _tcldis.
     """
-    bc = bc.copy()
-    insts = []
-    while len(bc) > 0:
-        insts.append(Inst(bc))
-    return insts
+    return [
+        Inst(bc, loc, opcode, rawops) for loc, opcode, rawops
+        in _tcldis.decode_insts(bc.bytecode(), bc.pc())
+    ]
 
 def _bblock_create(insts):
     """
     Given a list of Inst objects, split them up into basic blocks.
     """
-    # Identify the beginnings and ends of all basic blocks
-    starts = set()
-    ends = set()
+    loc_to_idx = dict([(inst.loc, i) for i, inst in enumerate(insts)])
+    # Identify the beginnings and ends of all basic blocks, marking them by
+    # instruction index
+    is_start = bytearray(len(insts))
+    is_end = bytearray(len(insts))
     newstart = True
     for i, inst in enumerate(insts):
         if newstart:
-            starts.add(inst.loc)
+            is_start[i] = True
             newstart = False
         if inst.targetloc is not None:
-            ends.add(inst.loc)
-            starts.add(inst.targetloc)
+            targetidx = loc_to_idx[inst.targetloc]
+            is_end[i] = True
+            is_start[targetidx] = True
             newstart = True
             # inst before target inst is end of a bblock
-            # search through instructions for instruction before the target
-            if inst.targetloc != 0:
-                instbeforeidx = 0
-                while True:
-                    if insts[instbeforeidx+1].loc == inst.targetloc: break
-                    instbeforeidx += 1
-                instbefore = insts[instbeforeidx]
-                ends.add(instbefore.loc)
-        elif inst.name in ['beginCatch4', 'endCatch']:
-            starts.add(inst.loc)
-            if inst.loc != 0:
-                ends.add(insts[i-1].loc)
-    ends.add(insts[-1].loc)
-    # Create the basic blocks
-    assert len(starts) == len(ends)
+            if targetidx > 0:
+                is_end[targetidx-1] = True
+        elif inst.name in CATCH_INSTRUCTIONS:
+            is_start[i] = True
+            if i > 0:
+                is_end[i-1] = True
+    is_end[-1] = True
+    # Create the basic blocks, every block must start immediately after the
+    # previous one ends
     bblocks = []
-    bblocks_insts = insts[:]
-    for start, end in zip(sorted(list(starts)), sorted(list(ends))):
-        bbinsts = []
-        assert bblocks_insts[0].loc == start
-        while bblocks_insts[0].loc < end:
-            bbinsts.append(bblocks_insts.pop(0))
-        assert bblocks_insts[0].loc == end
-        bbinsts.append(bblocks_insts.pop(0))
-        bblocks.append(BBlock(bbinsts, bbinsts[0].loc))
+    startidx = 0
+    for i in range(len(insts)):
+        assert bool(is_start[i]) == (i == startidx)
+        if is_end[i]:
+            bblocks.append(BBlock(insts[startidx:i+1], insts[startidx].loc))
+            startidx = i + 1
+    assert startidx == len(insts)
     return bblocks
 
+# Number of arguments for reductions which take as many arguments as the value
+# of their first operand
+FIRSTOP = -1
+
 def _inst_reductions():
     """
     Define how each instruction is reduced to one of my higher level
     representations.
     """
-    def N(n): return lambda _: n
-    firstop = lambda inst: inst.ops[0]
     def lit(s): return BCLiteral(None, s)
     def is_simple(arg):
         return any([
@@ -645,82 +691,65 @@ def _inst_reductions():
             for bctype in [BCLiteral, BCVarRef, BCArrayRef]
         ])
 
-    def getargsgen(nargs_fn, checkargs_fn=None):
-        def getargsfn(inst, bblock, i):
-            nargs = nargs_fn(inst)
-            arglist = []
-            argis = []
-            for argi, arg in reversed(list(enumerate(bblock.insts[:i]))):
-                if len(arglist) == nargs:
-                    break
-                if not isinstance(arg, BCValue):
-                    break
-                if arg.stackn < 1:
-                    continue
-                if checkargs_fn and not checkargs_fn(arg):
-                    break
-                arglist.append(arg)
-                argis.append(argi)
-            arglist.reverse()
-            if len(arglist) != nargs: return None
-            return arglist
-        return getargsfn
-
-    # nargs, redfn, checkfn
+    def one(redfn): return lambda inst, kv: (redfn(inst, kv),)
+
+    # nargs, redfn, checkfn - redfn returns a tuple of the values to replace
+    # its arguments with
     inst_reductions = {
         # Callers
-        'invokeStk1': [[firstop], BCProcCall],
-        'invokeStk4': [[firstop], BCProcCall],
-        'list':[[firstop], lambda inst, kv: BCProcCall(inst, [lit(u'list')] + kv)],
-        'listLength': [[N(1)], lambda inst, kv: BCProcCall(inst, [lit(u'llength'), kv[0]])],
-        'incrStkImm': [[N(1)], lambda inst, kv: BCProcCall(inst, [lit(u'incr'), kv[0]] + ([lit(unicode(inst.ops[0]))] if inst.ops[0] != 1 else []))],
-        'incrScalar1Imm': [[N(0)], lambda inst, kv: BCProcCall(inst, [lit(u'incr'), lit(inst.ops[0])] + ([lit(unicode(inst.ops[1]))] if inst.ops[1] != 1 else []))],
-        'incrScalarStkImm': [[N(1)], lambda inst, kv: BCProcCall(inst, [lit(u'incr'), kv[0]] + ([lit(unicode(inst.ops[0]))] if inst.ops[0] != 1 else []))],
-        'variable': [[N(1)], BCVariable],
+        'invokeStk1': [FIRSTOP, one(BCProcCall)],
+        'invokeStk4': [FIRSTOP, one(BCProcCall)],
+        'list':[FIRSTOP, lambda inst, kv: (BCProcCall(inst, [lit(u'list')] + kv),)],
+        'listLength': [1, lambda inst, kv: (BCProcCall(inst, [lit(u'llength'), kv[0]]),)],
+        'incrStkImm': [1, lambda inst, kv: (BCProcCall(inst, [lit(u'incr'), kv[0]] + ([lit(unicode(inst.ops[0]))] if inst.ops[0] != 1 else [])),)],
+        'incrScalar1Imm': [0, lambda inst, kv: (BCProcCall(inst, [lit(u'incr'), lit(inst.ops[0])] + ([lit(unicode(inst.ops[1]))] if inst.ops[1] != 1 else [])),)],
+        'incrScalarStkImm': [1, lambda inst, kv: (BCProcCall(inst, [lit(u'incr'), kv[0]] + ([lit(unicode(inst.ops[0]))] if inst.ops[0] != 1 else [])),)],
+        'variable': [1, one(BCVariable)],
         # Jumps
-        'jump1': [[N(0)], lambda i, v: BCJump(None, i, v)],
-        'jumpFalse1': [[N(1)], lambda i, v: BCJump(False, i, v)],
-        'jumpTrue1': [[N(1)], lambda i, v: BCJump(True, i, v)],
+        'jump1': [0, lambda i, v: (BCJump(None, i, v),)],
+        'jumpFalse1': [1, lambda i, v: (BCJump(False, i, v),)],
+        'jumpTrue1': [1, lambda i, v: (BCJump(True, i, v),)],
         # Variable references
-        'loadStk': [[N(1)], BCVarRef],
-        'loadScalarStk': [[N(1)], BCVarRef],
-        'loadArrayStk': [[N(2)], BCArrayRef],
-        'loadScalar1': [[N(0)], lambda inst, kv: BCVarRef(inst, [lit(inst.ops[0])])],
-        'loadArray1': [[N(1)], lambda inst, kv: BCArrayRef(inst, [lit(inst.ops[0]), kv[0]])],
+        'loadStk': [1, one(BCVarRef)],
+        'loadScalarStk': [1, one(BCVarRef)],
+        'loadArrayStk': [2, one(BCArrayRef)],
+        'loadScalar1': [0, lambda inst, kv: (BCVarRef(inst, [lit(inst.ops[0])]),)],
+        'loadArray1': [1, lambda inst, kv: (BCArrayRef(inst, [lit(inst.ops[0]), kv[0]]),)],
         # Variable sets
-        'storeStk': [[N(2)], BCSet],
-        'storeScalarStk': [[N(2)], BCSet],
-        'storeArrayStk': [[N(3)], lambda inst, kv: BCSet(inst, [BCArrayElt(None, kv[:2]), kv[2]])],
-        'storeScalar1': [[N(1)], lambda inst, kv: BCSet(inst, [lit(inst.ops[0]), kv[0]])],
-        'storeArray1': [[N(2)], lambda inst, kv: BCSet(inst, [BCArrayElt(None, [lit(inst.ops[0]), kv[0]]), kv[1]])],
+        'storeStk': [2, one(BCSet)],
+        'storeScalarStk': [2, one(BCSet)],
+        'storeArrayStk': [3, lambda inst, kv: (BCSet(inst, [BCArrayElt(None, kv[:2]), kv[2]]),)],
+        'storeScalar1': [1, lambda inst, kv: (BCSet(inst, [lit(inst.ops[0]), kv[0]]),)],
+        'storeArray1': [2, lambda inst, kv: (BCSet(inst, [BCArrayElt(None, [lit(inst.ops[0]), kv[0]]), kv[1]]),)],
         # Expressions
-        'gt': [[N(2)], BCExpr],
-        'lt': [[N(2)], BCExpr],
-        'ge': [[N(2)], BCExpr],
-        'le': [[N(2)], BCExpr],
-        'eq': [[N(2)], BCExpr],
-        'neq': [[N(2)], BCExpr],
-        'add': [[N(2)], BCExpr],
-        'not': [[N(1)], BCExpr],
+        'gt': [2, one(BCExpr)],
+        'lt': [2, one(BCExpr)],
+        'ge': [2, one(BCExpr)],
+        'le': [2, one(BCExpr)],
+        'eq': [2, one(BCExpr)],
+        'neq': [2, one(BCExpr)],
+        'add': [2, one(BCExpr)],
+        'not': [1, one(BCExpr)],
         # Misc
-        'concat1': [[firstop], BCConcat],
-        'pop': [[N(1), lambda arg: isinstance(arg, BCProcCall)], lambda i, v: v[0].destack()],
-        'dup': [[N(1), is_simple], lambda i, v: [v[0], v[0]]],
-        'done': [[N(1)], BCDone],
-        'returnImm': [[N(2)], BCReturn],
+        'concat1': [FIRSTOP, one(BCConcat)],
+        'pop': [1, lambda i, v: (v[0].destack(),), lambda arg: isinstance(arg, BCProcCall)],
+        'dup': [1, lambda i, v: (v[0], v[0]), is_simple],
+        'done': [1, one(BCDone)],
+        'returnImm': [2, one(BCReturn)],
         # Useless
-        'tryCvtToNumeric': [[N(0)], lambda _1, _2: []], # Theoretically does something...
-        'nop': [[N(0)], lambda _1, _2: []],
-        'startCommand': [[N(0)], lambda _1, _2: []],
+        'tryCvtToNumeric': [0, lambda _1, _2: ()], # Theoretically does something...
+        'nop': [0, lambda _1, _2: ()],
+        'startCommand': [0, lambda _1, _2: ()],
     }
-    for inst, (getargsgen_args, redfn) in inst_reductions.items():
-        inst_reductions[inst] = {
-            'getargsfn': getargsgen(*getargsgen_args),
-            'redfn': redfn,
-        }
+    for inst, reduction in inst_reductions.items():
+        nargs, redfn = reduction[:2]
+        checkargs_fn = reduction[2] if len(reduction) > 2 else None
+        inst_reductions[inst] = (nargs, redfn, checkargs_fn)
     return inst_reductions
 
 INST_REDUCTIONS = _inst_reductions()
+# INST_REDUCTIONS indexed by opcode, None where an instruction has no reduction
+INST_REDUCE_TABLE = tuple([INST_REDUCTIONS.get(name) for name, _, _ in INST_DISPATCH])
 
 def _bblock_hack(bc, bblock):
     """
@@ -733,7 +762,7 @@ def _bblock_hack(bc, bblock):
     for i, inst in enumerate(bblock.insts):
         if not isinstance(inst, Inst): continue
         if not inst.name == 'variable': continue
-        assert bblock.insts[i+1].name in ['push1', 'push4']
+        assert bblock.insts[i+1].opcode in (PUSH1, PUSH4)
         assert bc.literal(bblock.insts[i+1].ops[0]) == ''
         variableis.append(i)
     for i in reversed(variableis):
@@ -741,49 +770,100 @@ def _bblock_hack(bc, bblock):
         changes.append((TAG_H_VARIABLE, (i+1, i+2), (i+1, i+1)))
     return bblock, changes
 
+def _getargs(insts, nargs, checkargs_fn):
+    """
+    Find the nargs values on the top of the stack of reduced instructions,
+    returning None if they are not all available.
+    """
+    arglist = []
+    argi = len(insts)
+    while len(arglist) < nargs and argi > 0:
+        argi -= 1
+        arg = insts[argi]
+        if not isinstance(arg, BCValue):
+            break
+        if arg.stackn < 1:
+            continue
+        if checkargs_fn and not checkargs_fn(arg):
+            break
+        arglist.append(arg)
+    arglist.reverse()
+    if len(arglist) != nargs: return None
+    return arglist
+
 def _bblock_reduce(bc, bblock):
     """
     For the given basic block, attempt to reduce all instructions to my higher
     level representations.
+    This is a single left to right pass - reductions only consume values to
+    their left, which have already been reduced as far as they can be, so there
+    is never a need to go back and rescan the block.
     """
+    # Reduced instructions are pushed onto an output stack, and a reduction
+    # replaces the arguments it consumes from the top of that stack.
+    insts = []
+    # Index of the first instruction in the original bblock that each entry of
+    # insts was reduced from
+    srcs = []
+    # Each change is [tag, srcfrom, srcto, dstfrom, dstto]. A reduction which
+    # consumes the results of earlier reductions absorbs their changes.
     changes = []
-    for i, inst in enumerate(bblock.insts):
-        if not isinstance(inst, Inst): continue
-
-        if inst.name in ['push1', 'push4']:
-            bblock = bblock.replaceinst(i, [BCLiteral(inst, bc.literal(inst.ops[0]))])
-            changes.append((TAG_I_PUSH, (i, i+1), (i, i+1)))
-
-        elif inst.name in INST_REDUCTIONS:
-            IRED = INST_REDUCTIONS[inst.name]
-            getargsfn = IRED['getargsfn']
-            redfn = IRED['redfn']
-            arglist = getargsfn(inst, bblock, i)
-            if arglist is None: continue
-            newinsts = redfn(inst, arglist)
-            if type(newinsts) is not list:
-                newinsts = [newinsts]
-            irange = (i-len(arglist), i+1)
-            bblock = bblock.replaceinst(irange, newinsts)
-            changes.append((TAG_I_OTHER, irange, (irange[0], irange[0]+len(newinsts))))
+    for srci, inst in enumerate(bblock.insts):
+        newinsts = None
+        if type(inst) is not Inst:
+            pass
 
-        else:
-            continue # No change, continue scanning basic blcok
+        elif inst.opcode == PUSH1 or inst.opcode == PUSH4:
+            tag = TAG_I_PUSH
+            arglist = []
+            newinsts = (BCLiteral(inst, bc.literal(inst.ops[0])),)
+
+        elif INST_REDUCE_TABLE[inst.opcode] is not None:
+            nargs, redfn, checkargs_fn = INST_REDUCE_TABLE[inst.opcode]
+            if nargs == FIRSTOP:
+                nargs = inst.ops[0]
+            arglist = _getargs(insts, nargs, checkargs_fn)
+            if arglist is not None:
+                tag = TAG_I_OTHER
+                newinsts = redfn(inst, arglist)
+
+        if newinsts is None:
+            # No change, continue scanning basic block
+            insts.append(inst)
+            srcs.append(srci)
+            continue
 
-        break
+        ifrom = len(insts) - len(arglist)
+        srcfrom = srcs[ifrom] if arglist else srci
+        dstfrom = ifrom
+        while changes and changes[-1][1] >= srcfrom:
+            dstfrom = min(dstfrom, changes.pop()[3])
+        del insts[ifrom:]
+        del srcs[ifrom:]
+        insts.extend(newinsts)
+        srcs.extend([srcfrom] * len(newinsts))
+        changes.append([tag, srcfrom, srci + 1, dstfrom, len(insts)])
 
-    return bblock, changes
+    if changes:
+        bblock = BBlock(insts, bblock.loc)
+    return bblock, [
+        (tag, (srcfrom, srcto), (dstfrom, dstto))
+        for tag, srcfrom, srcto, dstfrom, dstto in changes
+    ]
 
 def _get_targets(bblocks):
-    targets = [target for target in [
-        (lambda jump: jump and jump.targetloc)(_get_jump(src_bblock))
-        for src_bblock in bblocks
-    ] if target is not None]
-    inst_targets = [bblock.insts for bblock in bblocks]
-    inst_targets = [i for i in itertools.chain(*inst_targets)]
-    inst_targets = [i for i in inst_targets if isinstance(i, Inst)]
-    inst_targets = [i.targetloc for i in inst_targets if i.targetloc is not None]
-    return targets + inst_targets
+    """
+    Count the number of jumps to each loc, as a Counter of loc -> count.
+    """
+    targets = Counter()
+    for bblock in bblocks:
+        jump = _get_jump(bblock)
+        if jump is not None and jump.targetloc is not None:
+            targets[jump.targetloc] += 1
+        for inst in bblock.insts:
+            if isinstance(inst, Inst) and inst.targetloc is not None:
+                targets[inst.targetloc] += 1
+    return targets
 def _get_jump(bblock):
     if len(bblock.insts) == 0: return None
     jump = bblock.insts[-1]
@@ -801,6 +881,10 @@ def _is_catch_end(bblock):
     return catch.name == 'endCatch'
 
 def _bblock_flow(bblocks):
+    # bblocks is only modified just before returning, so the jump targets can
+    # be counted once for all of the patterns below
+    targets = _get_targets(bblocks)
+
     # Recognise a basic if.
     # Observe that we don't try and recognise a basic if with no else branch -
     # it turns out that tcl implicitly inserts the else to provide all
@@ -828,9 +912,8 @@ def _bblock_flow(bblocks):
                 bblocks[i+1].insts + bblocks[i+2].insts
                 ]):
             continue
-        targets = _get_targets(bblocks)
-        if targets.count(bblocks[i+1].loc) > 0: continue
-        if targets.count(bblocks[i+2].loc) > 1: continue
+        if targets[bblocks[i+1].loc] > 0: continue
+        if targets[bblocks[i+2].loc] > 1: continue
         # Looks like an 'if', apply the bblock transformation
         changestart = ((i, 0), (i+2, len(bblocks[i+2].insts)))
         jumps = [bblocks[i+0].insts[-1], bblocks[i+1].insts[-1]]
@@ -908,19 +991,18 @@ def _bblock_flow(bblocks):
         # Unreduced because jumps don't know how to consume foreach_step
         if not isinstance(jump1, Inst) or jump1.name != 'jumpFalse1': continue
         if jump2 is None or jump2.on is not None: continue
-        if jump1.targetloc is not bblocks[i+3].loc: continue
-        if jump2.targetloc is not bblocks[i+1].loc: continue
+        if jump1.targetloc != bblocks[i+3].loc: continue
+        if jump2.targetloc != bblocks[i+1].loc: continue
         if any([isinstance(inst, Inst) for inst in bblocks[i+2].insts]): continue
         if not isinstance(bblocks[i+3].insts[0], BCLiteral): continue
-        targets = _get_targets(bblocks)
-        if targets.count(bblocks[i+1].loc) > 1: continue
-        if targets.count(bblocks[i+2].loc) > 0: continue
-        if targets.count(bblocks[i+3].loc) > 1: continue
+        if targets[bblocks[i+1].loc] > 1: continue
+        if targets[bblocks[i+2].loc] > 0: continue
+        if targets[bblocks[i+3].loc] > 1: continue
         # Looks like a 'foreach', apply the bblock transformation
         changestart = ((i, len(bblocks[i].insts)-1), (i+3, 1))
         foreach_start = bblocks[i].insts[-1]
         bblocks[i] = bblocks[i].popinst()
-        numvarlists = len(foreach_start.ops[0][1])
+        numvarlists = len(foreach_start.ops[0])
         varlists = []
         for i in range(numvarlists):
             varlists.append(bblocks[i].insts[-1])
@@ -939,11 +1021,14 @@ def _bblock_flow(bblocks):
 
 def _bblock_join(bblocks):
 
+    # Jump targets don't change until we modify bblocks and return, so count
+    # them once up front
+    targets = _get_targets(bblocks)
+
     # Remove empty unused blocks
     # TODO: unknown if this is needed
     for i, bblock in enumerate(bblocks):
         if len(bblock.insts) > 0: continue
-        targets = _get_targets(bblocks)
         if bblock.loc in targets: continue
         bblocks[i:i+1] = []
 
@@ -956,7 +1041,6 @@ def _bblock_join(bblocks):
         if len(bblocks[i:i+2]) < 2:
             continue
         bblock1, bblock2 = bblocks[i:i+2]
-        targets = _get_targets(bblocks)
         # If the end of bblock1 or the beginning of bblock2 should remain as
         # bblock boundaries, do not join them.
         if _get_jump(bblock1) is not None:
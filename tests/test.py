@@ -1,5 +1,6 @@
 import tclpy
 import tcldis
+import _tcldis
 import unittest
 
 from textwrap import dedent
@@ -90,6 +91,8 @@ foreach {a b} {1 2 3 4} {
 puts x
 ''')) # **
 
+cases.append(('nested_call', u'puts [list [llength $a] [list b $c]]\n')) # **
+
 # TODO: dict for **
 # TODO: expr **
 
@@ -150,6 +153,31 @@ def checkDecompileStepStructure(self, steps, changes):
     for bblock in steps[-1]:
         self.assertGreater(len(bblock), 0)
 
+def checkDecompileStepChanges(self, steps, changes):
+
+    # For steps which only reduce instructions within bblocks, every line
+    # outside the changed ranges must be carried over to the next step as is
+    reduce_tags = [tcldis.TAG_I_PUSH, tcldis.TAG_I_OTHER]
+    for si in range(len(steps) - 1):
+        stepchanges = [change for change in changes if change['step'] == si]
+        if not all([change['tag'] in reduce_tags for change in stepchanges]):
+            continue
+        prevSnapshot, snapshot = steps[si], steps[si+1]
+        self.assertEqual(len(prevSnapshot), len(snapshot))
+        for bbi, (prevBblock, bblock) in enumerate(zip(prevSnapshot, snapshot)):
+            bbchanges = sorted([
+                (change['from'], change['to']) for change in stepchanges
+                if change['from'][0][0] == bbi
+            ])
+            prevl = l = 0
+            for ((_, lfrom1), (_, lfrom2)), ((_, lto1), (_, lto2)) in bbchanges:
+                # Changes must not overlap
+                self.assertGreaterEqual(lfrom1, prevl)
+                self.assertGreaterEqual(lto1, l)
+                self.assertEqual(prevBblock[prevl:lfrom1], bblock[l:lto1])
+                prevl, l = lfrom2, lto2
+            self.assertEqual(prevBblock[prevl:], bblock[l:])
+
 # ----------
 
 class TestTclScript(unittest.TestCase):
@@ -158,6 +186,7 @@ class TestTclScript(unittest.TestCase):
     def assertDecompileStepStructure(self, tcl):
         steps, changes = tcldis.decompile_steps(tcldis.getbc(tcl))
         checkDecompileStepStructure(self, steps, changes)
+        checkDecompileStepChanges(self, steps, changes)
 
 class TestTclProc(unittest.TestCase):
     def assertTclEqual(self, tcl):
@@ -169,7 +198,64 @@ class TestTclProc(unittest.TestCase):
         tclpy.eval(proctcl)
         steps, changes = tcldis.decompile_steps(tcldis.getbc(proc_name='p'))
         checkDecompileStepStructure(self, steps, changes)
+        checkDecompileStepChanges(self, steps, changes)
+
+
+class TestTclBytecode(unittest.TestCase):
+    def test_decompilesteps_dup(self):
+        op = tcldis.INST_OPCODES
+        bytecode = bytearray([
+            op['push1'], 0,
+            op['push1'], 1,
+            op['dup'],
+            op['invokeStk1'], 3,
+            op['done'],
+        ])
+        bc = tcldis.BC(bytecode, [u'puts', u'a'], [], [])
+        self.assertEqual(u'puts a a\n', tcldis.decompile(bc))
+        steps, changes = tcldis.decompile_steps(bc)
+        checkDecompileStepStructure(self, steps, changes)
+        checkDecompileStepChanges(self, steps, changes)
 
+class TestDecodeInsts(unittest.TestCase):
+    def setUp(self):
+        op = tcldis.INST_OPCODES
+        self.bytecode = bytearray([
+            op['push1'], 0,
+            op['push1'], 1,
+            op['storeStk'],
+            op['jump1'], 0xfb,
+            op['push4'], 1, 0, 0, 0,
+            op['jump4'], 0xff, 0xff, 0xff, 0xff,
+            op['loadScalar4'], 0xff, 0xff, 0xff, 0xff,
+            op['done'],
+        ])
+        self.insts = [
+            (0, op['push1'], (0,)),
+            (2, op['push1'], (1,)),
+            (4, op['storeStk'], ()),
+            (5, op['jump1'], (-5,)),
+            (7, op['push4'], (0x1000000,)),
+            (12, op['jump4'], (-1,)),
+            (17, op['loadScalar4'], (0xffffffff,)),
+            (22, op['done'], ()),
+        ]
+    def test_decode(self):
+        self.assertEqual(self.insts, _tcldis.decode_insts(self.bytecode))
+    def test_decode_start(self):
+        self.assertEqual(self.insts[2:], _tcldis.decode_insts(self.bytecode, 4))
+        self.assertEqual([], _tcldis.decode_insts(self.bytecode, len(self.bytecode)))
+    def test_decode_bad_start(self):
+        self.assertRaises(ValueError, _tcldis.decode_insts, self.bytecode, -1)
+        self.assertRaises(
+            ValueError, _tcldis.decode_insts, self.bytecode, len(self.bytecode)+1
+        )
+    def test_decode_unknown_opcode(self):
+        self.assertRaises(RuntimeError, _tcldis.decode_insts, bytearray([0xff]))
+    def test_decode_truncated(self):
+        self.assertRaises(
+            RuntimeError, _tcldis.decode_insts, self.bytecode[:10]
+        )
 
 def setupcase(test_class, name, case):
     setattr(